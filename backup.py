@@ -0,0 +1,451 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import sqlite3
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from maintenance import DATABASE, UPLOAD_FOLDER, MaintenanceScheduler
+
+BACKUP_FOLDER = 'backups'
+# Pages copied per backup step and the pause between steps. With 4 KiB pages
+# a step is ~4 MiB, short enough that no single step is noticeable to requests.
+BACKUP_PAGES = 1024
+BACKUP_PAUSE = 0.01
+KEEP_LAST = 24
+KEEP_DAILY = 7
+
+SNAPSHOT_FORMAT = '%Y%m%dT%H%M%SZ'
+MANIFEST = 'manifest.json'
+DB_FILENAME = 'recipes.db'
+
+logger = logging.getLogger(__name__)
+
+
+class BackupError(Exception):
+    pass
+
+
+def _snapshots_dir(backup_folder):
+    return os.path.join(backup_folder, 'snapshots')
+
+
+def _blobs_dir(backup_folder):
+    return os.path.join(backup_folder, 'uploads')
+
+
+def _blob_path(backup_folder, digest):
+    return os.path.join(_blobs_dir(backup_folder), digest[:2], digest)
+
+
+@contextmanager
+def backup_lock(backup_folder):
+    # Snapshots reuse blobs that already exist and prune deletes blobs no
+    # manifest references, so the two must never interleave, including
+    # across processes (the server's scheduler and the CLI).
+    os.makedirs(backup_folder, exist_ok=True)
+    with open(os.path.join(backup_folder, '.lock'), 'a+') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_snapshots(backup_folder=BACKUP_FOLDER):
+    root = _snapshots_dir(backup_folder)
+    if not os.path.isdir(root):
+        return []
+    names = [
+        name for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, MANIFEST))
+    ]
+    return sorted(names)
+
+
+def load_manifest(backup_folder, name):
+    path = os.path.join(_snapshots_dir(backup_folder), name, MANIFEST)
+    if not os.path.exists(path):
+        raise BackupError(f"Snapshot not found: {name}")
+    with open(path) as f:
+        return json.load(f)
+
+
+def resolve_snapshot(backup_folder, name=None):
+    snapshots = list_snapshots(backup_folder)
+    if not snapshots:
+        raise BackupError("No snapshots available")
+    if name in (None, 'latest'):
+        return snapshots[-1]
+    if name not in snapshots:
+        raise BackupError(f"Snapshot not found: {name}")
+    return name
+
+
+def copy_database(src, dst, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    # Holding a read transaction on the source pins one WAL snapshot, so the
+    # copy is consistent and is not restarted by writes from other
+    # connections. Readers and writers keep going; no lock is held while we
+    # sleep between steps.
+    def progress(status, remaining, total):
+        time.sleep(pause)
+
+    src.execute('BEGIN')
+    try:
+        src.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        src.backup(dst, pages=pages, progress=progress)
+    finally:
+        src.rollback()
+
+
+def backup_database(db_path, target_path, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    tmp_path = target_path + '.part'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    src = sqlite3.connect(db_path, timeout=5, isolation_level=None)
+    dst = sqlite3.connect(tmp_path)
+    try:
+        copy_database(src, dst, pages, pause)
+        # A snapshot is a single self-contained file.
+        dst.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_path, target_path)
+
+
+def backup_uploads(upload_folder, backup_folder, previous=None):
+    # Files whose size and mtime match the previous manifest reuse its hash,
+    # and blobs already in the store are never copied again, so a snapshot
+    # only reads and writes the uploads that changed since the last one.
+    previous = previous or {}
+    entries = {}
+    copied_bytes = 0
+    if not os.path.isdir(upload_folder):
+        return entries, copied_bytes
+    with os.scandir(upload_folder) as scan:
+        for entry in scan:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            known = previous.get(entry.name)
+            if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+                digest = known['sha256']
+            else:
+                digest = file_sha256(entry.path)
+            blob = _blob_path(backup_folder, digest)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.copyfile(entry.path, blob + '.part')
+                os.replace(blob + '.part', blob)
+                copied_bytes += stat.st_size
+            entries[entry.name] = {'sha256': digest, 'size': stat.st_size, 'mtime': stat.st_mtime}
+    return entries, copied_bytes
+
+
+def create_snapshot(db_path=DATABASE, upload_folder=UPLOAD_FOLDER, backup_folder=BACKUP_FOLDER,
+                    pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    with backup_lock(backup_folder):
+        return _create_snapshot(db_path, upload_folder, backup_folder, pages, pause)
+
+
+def snapshot_and_prune(db_path=DATABASE, upload_folder=UPLOAD_FOLDER, backup_folder=BACKUP_FOLDER,
+                       keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    with backup_lock(backup_folder):
+        manifest = _create_snapshot(db_path, upload_folder, backup_folder, pages, pause)
+        _prune_snapshots(backup_folder, keep_last, keep_daily)
+        return manifest
+
+
+def _create_snapshot(db_path, upload_folder, backup_folder, pages, pause):
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    name = now.strftime(SNAPSHOT_FORMAT)
+    snapshot_dir = os.path.join(_snapshots_dir(backup_folder), name)
+    if os.path.exists(snapshot_dir):
+        raise BackupError(f"Snapshot already exists: {name}")
+    os.makedirs(snapshot_dir)
+
+    previous = {}
+    snapshots = list_snapshots(backup_folder)
+    if snapshots:
+        previous = load_manifest(backup_folder, snapshots[-1])['uploads']
+
+    try:
+        db_target = os.path.join(snapshot_dir, DB_FILENAME)
+        backup_database(db_path, db_target, pages, pause)
+        uploads, copied_bytes = backup_uploads(upload_folder, backup_folder, previous)
+        manifest = {
+            'name': name,
+            'created_at': now.isoformat(),
+            'database': {
+                'file': DB_FILENAME,
+                'size': os.path.getsize(db_target),
+                'sha256': file_sha256(db_target),
+            },
+            'uploads': uploads,
+        }
+        # The manifest is written last; a directory without one is an
+        # incomplete snapshot and is ignored by list_snapshots.
+        with open(os.path.join(snapshot_dir, MANIFEST + '.part'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(os.path.join(snapshot_dir, MANIFEST + '.part'), os.path.join(snapshot_dir, MANIFEST))
+    except Exception:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        raise
+
+    elapsed = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Snapshot {name} created in {elapsed}s: database {manifest['database']['size']} bytes, "
+        f"{len(uploads)} uploads, {copied_bytes} new upload bytes"
+    )
+    return manifest
+
+
+def verify_snapshot(name=None, backup_folder=BACKUP_FOLDER):
+    name = resolve_snapshot(backup_folder, name)
+    manifest = load_manifest(backup_folder, name)
+    problems = []
+
+    db_file = os.path.join(_snapshots_dir(backup_folder), name, manifest['database']['file'])
+    if not os.path.exists(db_file):
+        problems.append(f"missing database file {db_file}")
+    elif file_sha256(db_file) != manifest['database']['sha256']:
+        problems.append("database checksum mismatch")
+    else:
+        conn = sqlite3.connect(f'file:{db_file}?mode=ro', uri=True)
+        try:
+            result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            conn.close()
+        if result != 'ok':
+            problems.append(f"database integrity check failed: {result}")
+
+    for filename, entry in manifest['uploads'].items():
+        blob = _blob_path(backup_folder, entry['sha256'])
+        if not os.path.exists(blob):
+            problems.append(f"missing upload {filename}")
+        elif file_sha256(blob) != entry['sha256']:
+            problems.append(f"upload checksum mismatch for {filename}")
+
+    if problems:
+        logger.error(f"Snapshot {name} failed verification: {'; '.join(problems)}")
+    return problems
+
+
+def restore_snapshot(name=None, db_path=DATABASE, upload_folder=UPLOAD_FOLDER,
+                     backup_folder=BACKUP_FOLDER, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    # Held so a concurrent prune cannot remove blobs mid-restore.
+    with backup_lock(backup_folder):
+        return _restore_snapshot(name, db_path, upload_folder, backup_folder, pages, pause)
+
+
+def _restore_snapshot(name, db_path, upload_folder, backup_folder, pages, pause):
+    name = resolve_snapshot(backup_folder, name)
+    problems = verify_snapshot(name, backup_folder)
+    if problems:
+        raise BackupError(f"Refusing to restore {name}: {'; '.join(problems)}")
+    manifest = load_manifest(backup_folder, name)
+
+    # Restoring through the backup API (rather than copying the file over)
+    # keeps the live database's WAL consistent for connections that are open.
+    db_file = os.path.join(_snapshots_dir(backup_folder), name, manifest['database']['file'])
+    src = sqlite3.connect(f'file:{db_file}?mode=ro', uri=True, isolation_level=None)
+    dst = sqlite3.connect(db_path, timeout=30)
+    try:
+        copy_database(src, dst, pages, pause)
+    finally:
+        dst.close()
+        src.close()
+
+    os.makedirs(upload_folder, exist_ok=True)
+    restored = 0
+    for filename, entry in manifest['uploads'].items():
+        target = os.path.join(upload_folder, filename)
+        if os.path.exists(target) and os.path.getsize(target) == entry['size'] \
+                and file_sha256(target) == entry['sha256']:
+            continue
+        shutil.copyfile(_blob_path(backup_folder, entry['sha256']), target)
+        os.utime(target, (entry['mtime'], entry['mtime']))
+        restored += 1
+    logger.info(f"Restored snapshot {name} to {db_path}, {restored} uploads written")
+    return manifest
+
+
+def select_retained(snapshots, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, now=None):
+    # Keep the newest keep_last snapshots plus the newest snapshot of each of
+    # the last keep_daily days. The newest snapshot is always kept.
+    now = now or datetime.now(timezone.utc)
+    keep = set(sorted(snapshots)[-max(keep_last, 1):]) if snapshots else set()
+    cutoff = (now - timedelta(days=keep_daily)).date()
+    newest_per_day = {}
+    for name in sorted(snapshots):
+        day = datetime.strptime(name, SNAPSHOT_FORMAT).date()
+        if day > cutoff:
+            newest_per_day[day] = name
+    keep.update(newest_per_day.values())
+    return keep
+
+
+def prune_snapshots(backup_folder=BACKUP_FOLDER, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY):
+    with backup_lock(backup_folder):
+        return _prune_snapshots(backup_folder, keep_last, keep_daily)
+
+
+def _prune_snapshots(backup_folder, keep_last, keep_daily):
+    snapshots = list_snapshots(backup_folder)
+    keep = select_retained(snapshots, keep_last, keep_daily)
+    removed = []
+    for name in snapshots:
+        if name not in keep:
+            shutil.rmtree(os.path.join(_snapshots_dir(backup_folder), name))
+            removed.append(name)
+
+    referenced = set()
+    for name in keep:
+        referenced.update(entry['sha256'] for entry in load_manifest(backup_folder, name)['uploads'].values())
+    reclaimed = 0
+    blobs = _blobs_dir(backup_folder)
+    if os.path.isdir(blobs):
+        for prefix in os.listdir(blobs):
+            for digest in os.listdir(os.path.join(blobs, prefix)):
+                if digest not in referenced:
+                    path = os.path.join(blobs, prefix, digest)
+                    reclaimed += os.path.getsize(path)
+                    os.remove(path)
+            if not os.listdir(os.path.join(blobs, prefix)):
+                os.rmdir(os.path.join(blobs, prefix))
+    if removed:
+        logger.info(f"Pruned {len(removed)} snapshots, {reclaimed} upload bytes reclaimed")
+    return removed
+
+
+class BackupScheduler(MaintenanceScheduler):
+    def __init__(self, interval, db_path=DATABASE, upload_folder=UPLOAD_FOLDER,
+                 backup_folder=BACKUP_FOLDER, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY):
+        super().__init__(interval, db_path, upload_folder)
+        self.backup_folder = backup_folder
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+
+    def run_once(self):
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self.last_report = snapshot_and_prune(
+                self.db_path, self.upload_folder, self.backup_folder, self.keep_last, self.keep_daily
+            )
+            return self.last_report
+        finally:
+            self._lock.release()
+
+
+def start_scheduler(app):
+    interval = app.config.get('BACKUP_INTERVAL', 0)
+    if not interval:
+        return None
+    scheduler = app.extensions.get('backup')
+    if scheduler is None:
+        scheduler = BackupScheduler(
+            interval,
+            db_path=app.config.get('DATABASE', DATABASE),
+            upload_folder=app.config['UPLOAD_FOLDER'],
+            backup_folder=app.config.get('BACKUP_FOLDER', BACKUP_FOLDER),
+            keep_last=app.config.get('BACKUP_KEEP_LAST', KEEP_LAST),
+            keep_daily=app.config.get('BACKUP_KEEP_DAILY', KEEP_DAILY),
+        )
+        app.extensions['backup'] = scheduler
+    scheduler.start()
+    return scheduler
+
+
+def keep_last_count(value):
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return count
+
+
+def main(argv=None):
+    # Same defaults as the running app, so the CLI targets the same files.
+    from app import default_config
+    config = default_config()
+    parser = argparse.ArgumentParser(description='Hot backups and restores of the Crave database and uploads.')
+    parser.add_argument('--db', default=config['DATABASE'], help='path to the SQLite database')
+    parser.add_argument('--uploads', default=config['UPLOAD_FOLDER'], help='path to the uploads folder')
+    parser.add_argument('--backups', default=config['BACKUP_FOLDER'], help='path to the backup folder')
+    parser.add_argument('--pages', type=int, default=BACKUP_PAGES, help='pages copied per backup step')
+    parser.add_argument('--pause', type=float, default=BACKUP_PAUSE, help='seconds to sleep between steps')
+    commands = parser.add_subparsers(dest='command', required=True)
+    snapshot = commands.add_parser('snapshot', help='take a snapshot and apply retention')
+    snapshot.add_argument('--keep-last', type=keep_last_count, default=KEEP_LAST)
+    snapshot.add_argument('--keep-daily', type=int, default=KEEP_DAILY)
+    commands.add_parser('list', help='list snapshots')
+    verify = commands.add_parser('verify', help='check a snapshot against its manifest')
+    verify.add_argument('name', nargs='?', default='latest')
+    restore = commands.add_parser('restore', help='verify a snapshot and restore it')
+    restore.add_argument('name', nargs='?', default='latest')
+    prune = commands.add_parser('prune', help='apply retention without taking a snapshot')
+    prune.add_argument('--keep-last', type=keep_last_count, default=KEEP_LAST)
+    prune.add_argument('--keep-daily', type=int, default=KEEP_DAILY)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.command == 'snapshot':
+            manifest = snapshot_and_prune(
+                args.db, args.uploads, args.backups, args.keep_last, args.keep_daily, args.pages, args.pause
+            )
+            print(manifest['name'])
+        elif args.command == 'list':
+            for name in list_snapshots(args.backups):
+                manifest = load_manifest(args.backups, name)
+                print(f"{name}  {manifest['database']['size']:>12} bytes  {len(manifest['uploads']):>6} uploads")
+        elif args.command == 'verify':
+            problems = verify_snapshot(args.name, args.backups)
+            for problem in problems:
+                print(problem)
+            if problems:
+                return 1
+            print("OK")
+        elif args.command == 'restore':
+            manifest = restore_snapshot(args.name, args.db, args.uploads, args.backups, args.pages, args.pause)
+            print(f"Restored {manifest['name']}")
+        elif args.command == 'prune':
+            for name in prune_snapshots(args.backups, args.keep_last, args.keep_daily):
+                print(f"Removed {name}")
+    except BackupError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
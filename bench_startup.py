@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Run in a fresh interpreter so every sample pays the full import cost, the
+# same as a newly spawned worker.
+COLD_START = '''
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app(json.loads(sys.argv[1]))
+t2 = time.perf_counter()
+client = app.test_client()
+client.get('/')
+t3 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first_request': t3 - t2}))
+'''
+
+REQUEST_PATHS = ['/', '/search_suggestions?q=pasta', '/login']
+
+
+def bench_config(workdir):
+    return {
+        'SECRET_KEY': 'bench',
+        'DATABASE': os.path.join(workdir, 'bench.db'),
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'MAINTENANCE_INTERVAL': 0,
+        'BACKUP_INTERVAL': 0,
+        'LOG_LEVEL': 'WARNING',
+    }
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.2f} ms"
+
+
+def bench_cold_start(config, runs):
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', COLD_START, json.dumps(config)],
+            cwd=here, capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(f"Cold start ({runs} runs, median)")
+    for key in ('import', 'create_app', 'first_request'):
+        print(f"  {key:<16}{ms(statistics.median(s[key] for s in samples))}")
+    total = statistics.median(sum(s.values()) for s in samples)
+    print(f"  {'total':<16}{ms(total)}")
+
+
+def bench_requests(config, requests):
+    from app import create_app
+    app = create_app(config)
+    client = app.test_client()
+    print(f"Per-request overhead ({requests} requests per path)")
+    for path in REQUEST_PATHS:
+        client.get(path)
+        samples = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            client.get(path)
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        p99 = samples[int(len(samples) * 0.99) - 1]
+        print(f"  {path:<32} p50{ms(statistics.median(samples))}  p99{ms(p99)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure app cold-start time and per-request overhead.')
+    parser.add_argument('--runs', type=int, default=10, help='cold-start samples')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per path')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = bench_config(workdir)
+        bench_cold_start(config, args.runs)
+        bench_requests(config, args.requests)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,107 @@
+import os
+import asyncio
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.security import generate_password_hash
-from flask import g
+from flask import g, current_app, has_app_context
+import revisions
+
+# Default path for connections opened outside any app (scripts). Requests
+# always use their app's DATABASE setting.
+DATABASE = 'recipes.db'
+
+# Bounded pool the *_async functions run on, so a burst of requests queues
+# for a database thread instead of opening unbounded connections. Every
+# in-flight request already holds one of serve.py's WSGI_THREADS, so the
+# default matches that pool; a smaller pool would become the bottleneck.
+DB_EXECUTOR_WORKERS = int(os.environ.get('DB_EXECUTOR_WORKERS', os.environ.get('WSGI_THREADS', 32)))
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+# Every connection opened on an executor thread, so shutdown can close them.
+_thread_connections = []
+_connections_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='crave-db')
+        return _executor
+
+def shutdown_executor(wait=True):
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+    # Connections can only be closed once no worker is still using them.
+    if wait:
+        with _connections_lock:
+            while _thread_connections:
+                _thread_connections.pop().close()
+
+def _thread_db(path):
+    # One connection per executor thread and database path.
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    if path not in connections:
+        # Opened and used only on this thread; closed by shutdown_executor
+        # from the main thread after the pool has drained.
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        connections[path] = conn
+        with _connections_lock:
+            _thread_connections.append(conn)
+    return connections[path]
+
+def _call_with_database(path, func, args):
+    _local.path = path
+    try:
+        return func(*args)
+    finally:
+        _local.path = None
+        # A failed call can leave its transaction open; the connection is
+        # reused, and an open transaction would pin an old snapshot and the WAL.
+        conn = getattr(_local, 'connections', {}).get(path)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+
+async def _run_in_executor(func, *args):
+    # Resolve the path on the request thread; the worker has no app context
+    # and may serve several apps in the same process.
+    path = current_app.config['DATABASE'] if has_app_context() else DATABASE
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), _call_with_database, path, func, args)
 
 def get_db(): 
+    # Executor threads have no app context; they use the database path the
+    # caller handed to _run_in_executor.
+    if not has_app_context():
+        return _thread_db(getattr(_local, 'path', None) or DATABASE)
     if 'db' not in g:
-        g.db = sqlite3.connect('recipes.db')
+        g.db = sqlite3.connect(current_app.config['DATABASE'])
         g.db.row_factory = sqlite3.Row
     return g.db
 
-def init_db():
-    with sqlite3.connect('recipes.db') as conn:
+def close_db(error=None):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
+    init_db(app.config['DATABASE'])
+
+def init_db(path=None):
+    with sqlite3.connect(path or DATABASE) as conn:
         cursor = conn.cursor()
+        # auto_vacuum only takes effect on a fresh database; it lets the
+        # maintenance job hand free pages back in small steps.
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('PRAGMA journal_mode = WAL')
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY,
@@ -51,6 +142,28 @@ def init_db():
                            FOREIGN KEY(user_id) REFERENCES users(id)
                            )
                         ''')
+        # Edit history: the recipes row is always the current version; each
+        # edit adds a compressed delta (or a periodic full snapshot) here.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS recipe_revisions (
+                id INTEGER PRIMARY KEY,
+                recipe_id INTEGER,
+                revision INTEGER,
+                user_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                kind TEXT,
+                image TEXT,
+                changed TEXT,
+                data BLOB,
+                FOREIGN KEY(recipe_id) REFERENCES recipes(id),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                UNIQUE (recipe_id, revision)
+            )
+        ''')
+        # Added after recipe_revisions was first released.
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(recipe_revisions)')]
+        if 'changed' not in columns:
+            cursor.execute('ALTER TABLE recipe_revisions ADD COLUMN changed TEXT')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipes_user_id ON recipes(user_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipes_category ON recipes(category)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipes_tags ON recipes(tags)')
@@ -145,24 +258,109 @@ def remove_favorite_from_db(user_id, recipe_id):
 def delete_recipe_from_db(recipe_id):
     db = get_db()
     cursor = db.cursor()
+    cursor.execute('DELETE FROM favorites WHERE recipe_id = ?', (recipe_id,))
+    cursor.execute('DELETE FROM comments WHERE recipe_id = ?', (recipe_id,))
+    cursor.execute('DELETE FROM recipe_revisions WHERE recipe_id = ?', (recipe_id,))
     cursor.execute('DELETE FROM recipes WHERE id = ?', (recipe_id,))
     db.commit()
 
-def update_recipe(recipe_id, title, ingredients, instructions, category, tags, image=None):
+def _add_revision(cursor, recipe_id, revision, user_id, kind, image, changed, data):
+    cursor.execute('''
+        INSERT INTO recipe_revisions (recipe_id, revision, user_id, kind, image, changed, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (recipe_id, revision, user_id, kind, image, revisions.encode_changed(changed), data))
+
+def _record_revision(cursor, recipe_id, old, new, user_id):
+    cursor.execute(
+        "SELECT MAX(revision) FROM recipe_revisions WHERE recipe_id = ?", (recipe_id,)
+    )
+    latest = cursor.fetchone()[0]
+    old_doc = revisions.recipe_document(old)
+    new_doc = revisions.recipe_document(new)
+    if latest is None:
+        # First edit of a recipe that predates history: keep the original.
+        latest = 1
+        _add_revision(cursor, recipe_id, latest, old['user_id'], revisions.SNAPSHOT,
+                      old['image'], [], revisions.encode_snapshot(old_doc))
+    changed = revisions.diff_fields(old_doc, new_doc, old['image'], new['image'])
+    if not changed:
+        return latest
+    revision = latest + 1
+    if revisions.is_snapshot_revision(revision):
+        kind, data = revisions.SNAPSHOT, revisions.encode_snapshot(new_doc)
+    else:
+        kind, data = revisions.DELTA, revisions.encode_delta(old_doc, new_doc)
+    _add_revision(cursor, recipe_id, revision, user_id, kind, new['image'], changed, data)
+    return revision
+
+def update_recipe(recipe_id, title, ingredients, instructions, category, tags, image=None, user_id=None):
     db = get_db()
+    if db.in_transaction:
+        # BEGIN IMMEDIATE would fail, and committing here would silently
+        # commit whatever the caller has pending.
+        raise RuntimeError("update_recipe called with a transaction already open")
     cursor = db.cursor()
-    cursor.execute('''
-        UPDATE recipes SET
-            title = ?,
-            ingredients = ?,
-            instructions = ?,
-            category = ?,
-            tags = ?,
-            image = COALESCE(?, image)
-        WHERE id = ?
-    ''', (title, ingredients, instructions, category, tags, image, recipe_id))
+    # Take the write lock before reading the current row, so overlapping
+    # edits of the same recipe are serialised and each delta is computed
+    # against the revision actually stored just before it.
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
+        old = cursor.fetchone()
+        cursor.execute('''
+            UPDATE recipes SET
+                title = ?,
+                ingredients = ?,
+                instructions = ?,
+                category = ?,
+                tags = ?,
+                image = COALESCE(?, image)
+            WHERE id = ?
+        ''', (title, ingredients, instructions, category, tags, image, recipe_id))
+        if old is not None:
+            cursor.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
+            _record_revision(cursor, recipe_id, old, cursor.fetchone(), user_id)
+    except Exception:
+        db.rollback()
+        raise
     db.commit()
 
+def get_recipe_revisions(recipe_id):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('''
+        SELECT rv.id, rv.revision, rv.created_at, rv.kind, rv.image, rv.changed, rv.data,
+               LENGTH(rv.data) AS size, u.username
+        FROM recipe_revisions rv
+        LEFT JOIN users u ON rv.user_id = u.id
+        WHERE rv.recipe_id = ?
+        ORDER BY rv.revision DESC
+    ''', (recipe_id,))
+    return cursor.fetchall()
+
+def get_recipe_revision(recipe_id, revision):
+    db = get_db()
+    cursor = db.cursor()
+    # Only the nearest snapshot at or before the revision and the deltas
+    # after it are read.
+    cursor.execute('''
+        SELECT revision, kind, image, data, created_at
+        FROM recipe_revisions
+        WHERE recipe_id = ? AND revision <= ? AND revision >= (
+            SELECT MAX(revision) FROM recipe_revisions
+            WHERE recipe_id = ? AND revision <= ? AND kind = ?
+        )
+        ORDER BY revision
+    ''', (recipe_id, revision, recipe_id, revision, revisions.SNAPSHOT))
+    rows = cursor.fetchall()
+    if not rows or rows[-1]['revision'] != revision:
+        return None
+    document = revisions.rebuild(rows)
+    document['revision'] = revision
+    document['image'] = rows[-1]['image']
+    document['created_at'] = rows[-1]['created_at']
+    return document
+
 def get_user_recipes(user_id):
     db = get_db()
     cursor = db.cursor()
@@ -188,6 +386,12 @@ def get_recipe_by_id(recipe_id):
     cursor.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
     return cursor.fetchone()
 
+def search_recipe_titles(query, limit=5):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT id, title FROM recipes WHERE title LIKE ? LIMIT ?", (f"%{query}%", limit))
+    return cursor.fetchall()
+
 def get_recipes_by_category(category):
     db = get_db()
     cursor = db.cursor()
@@ -233,3 +437,29 @@ def get_user_recipes_with_username(user_id):
         WHERE r.user_id = ?
     ''', (user_id,))
     return cursor.fetchall()
+
+
+# Async variants of the hot paths, run on the bounded executor.
+async def get_recipe_by_id_async(recipe_id):
+    return await _run_in_executor(get_recipe_by_id, recipe_id)
+
+async def get_all_recipes_with_users_async():
+    return await _run_in_executor(get_all_recipes_with_users)
+
+async def get_user_favorites_async(user_id):
+    return await _run_in_executor(get_user_favorites, user_id)
+
+async def get_comments_for_recipe_async(recipe_id):
+    return await _run_in_executor(get_comments_for_recipe, recipe_id)
+
+async def get_comment_by_id_async(comment_id):
+    return await _run_in_executor(get_comment_by_id, comment_id)
+
+async def search_recipe_titles_async(query, limit=5):
+    return await _run_in_executor(search_recipe_titles, query, limit)
+
+async def add_comment_async(user_id, recipe_id, comment_text):
+    return await _run_in_executor(add_comment, user_id, recipe_id, comment_text)
+
+async def delete_comment_from_db_async(comment_id):
+    return await _run_in_executor(delete_comment_from_db, comment_id)
@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import logging
+import sqlite3
+import argparse
+import threading
+
+DATABASE = 'recipes.db'
+UPLOAD_FOLDER = 'static/uploads'
+
+# Work is done in small batches with a short pause in between so a
+# maintenance run never holds the write lock long enough to stall requests.
+BATCH_SIZE = 200
+BATCH_PAUSE = 0.05
+VACUUM_PAGES = 256
+# Uploads younger than this are left alone: add_recipe/edit_recipe save the
+# file before the row that references it is written.
+UPLOAD_GRACE_SECONDS = 60 * 60
+
+logger = logging.getLogger(__name__)
+
+ORPHAN_QUERIES = {
+    'favorites': '''
+        DELETE FROM favorites WHERE rowid IN (
+            SELECT f.rowid FROM favorites f
+            WHERE NOT EXISTS (SELECT 1 FROM recipes r WHERE r.id = f.recipe_id)
+               OR NOT EXISTS (SELECT 1 FROM users u WHERE u.id = f.user_id)
+            LIMIT ?
+        )
+    ''',
+    'comments': '''
+        DELETE FROM comments WHERE rowid IN (
+            SELECT c.rowid FROM comments c
+            WHERE NOT EXISTS (SELECT 1 FROM recipes r WHERE r.id = c.recipe_id)
+               OR NOT EXISTS (SELECT 1 FROM users u WHERE u.id = c.user_id)
+            LIMIT ?
+        )
+    ''',
+    'recipe_revisions': '''
+        DELETE FROM recipe_revisions WHERE rowid IN (
+            SELECT rv.rowid FROM recipe_revisions rv
+            WHERE NOT EXISTS (SELECT 1 FROM recipes r WHERE r.id = rv.recipe_id)
+            LIMIT ?
+        )
+    ''',
+}
+
+
+def connect(db_path=DATABASE):
+    conn = sqlite3.connect(db_path, timeout=5)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def optimize_db(conn, upload_folder=None):
+    # A database that has never been analyzed has no sqlite_stat1 table and
+    # PRAGMA optimize would skip it, so do a bounded ANALYZE the first time.
+    conn.execute('PRAGMA analysis_limit = 400')
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone()
+    if has_stats:
+        conn.execute('PRAGMA optimize')
+    else:
+        conn.execute('ANALYZE')
+    conn.commit()
+    return {'items': 0, 'reclaimed_bytes': 0}
+
+
+def incremental_vacuum(conn, upload_folder=None, pages=VACUUM_PAGES, pause=BATCH_PAUSE):
+    # auto_vacuum 2 == INCREMENTAL. Databases created before init_db set it
+    # need a one-off conversion before this job can do anything.
+    if _pragma(conn, 'auto_vacuum') != 2:
+        logger.info(
+            "Incremental vacuum skipped: auto_vacuum is not INCREMENTAL; "
+            "run 'python maintenance.py --enable-incremental-vacuum' once to convert"
+        )
+        return {'items': 0, 'reclaimed_bytes': 0}
+    page_size = _pragma(conn, 'page_size')
+    freed = 0
+    free_pages = _pragma(conn, 'freelist_count')
+    while free_pages:
+        # executescript steps the pragma to completion; a plain execute()
+        # only releases a single page per call.
+        conn.executescript(f'PRAGMA incremental_vacuum({min(pages, free_pages)})')
+        remaining = _pragma(conn, 'freelist_count')
+        if remaining >= free_pages:
+            break
+        freed += free_pages - remaining
+        free_pages = remaining
+        time.sleep(pause)
+    return {'items': freed, 'reclaimed_bytes': freed * page_size}
+
+
+def enable_incremental_vacuum(db_path=DATABASE):
+    # One-off conversion for databases created before init_db set
+    # auto_vacuum. VACUUM rewrites the whole file and holds the write lock
+    # while it does, so run this from the CLI during a quiet period.
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        if _pragma(conn, 'auto_vacuum') == 2:
+            return False
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return _pragma(conn, 'auto_vacuum') == 2
+    finally:
+        conn.close()
+
+
+def checkpoint_wal(conn, upload_folder=None):
+    if _pragma(conn, 'journal_mode') != 'wal':
+        return {'items': 0, 'reclaimed_bytes': 0}
+    wal_path = conn.execute('PRAGMA database_list').fetchone()['file'] + '-wal'
+    size_before = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    # PASSIVE never waits on readers or writers.
+    busy, log_frames, checkpointed = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+    if not busy and log_frames == checkpointed:
+        # TRUNCATE blocks new writers while it waits for readers still on
+        # the old WAL, so try it without a busy handler and skip this run if
+        # anyone is in the way.
+        timeout = _pragma(conn, 'busy_timeout')
+        conn.execute('PRAGMA busy_timeout = 0')
+        try:
+            if conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()[0]:
+                logger.info("WAL truncate skipped: database busy")
+        except sqlite3.OperationalError:
+            logger.info("WAL truncate skipped: database busy")
+        finally:
+            conn.execute(f'PRAGMA busy_timeout = {timeout}')
+    size_after = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    return {'items': max(checkpointed, 0), 'reclaimed_bytes': max(size_before - size_after, 0)}
+
+
+def _has_table(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def sweep_orphans(conn, upload_folder=None, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    removed = 0
+    for table, query in ORPHAN_QUERIES.items():
+        if not _has_table(conn, table):
+            continue
+        while True:
+            cursor = conn.execute(query, (batch_size,))
+            conn.commit()
+            removed += cursor.rowcount
+            if cursor.rowcount:
+                logger.info(f"Removed {cursor.rowcount} orphaned rows from {table}")
+            if cursor.rowcount < batch_size:
+                break
+            time.sleep(pause)
+    # Freed pages are handed back by incremental_vacuum, not here.
+    return {'items': removed, 'reclaimed_bytes': 0}
+
+
+def referenced_uploads(conn):
+    rows = conn.execute('SELECT DISTINCT image FROM recipes WHERE image IS NOT NULL').fetchall()
+    referenced = {row['image'] for row in rows}
+    # Older revisions keep their image so they can be restored.
+    if _has_table(conn, 'recipe_revisions'):
+        rows = conn.execute('SELECT DISTINCT image FROM recipe_revisions WHERE image IS NOT NULL').fetchall()
+        referenced.update(row['image'] for row in rows)
+    return referenced
+
+
+def gc_uploads(conn, upload_folder=UPLOAD_FOLDER, batch_size=BATCH_SIZE, pause=BATCH_PAUSE,
+               grace=UPLOAD_GRACE_SECONDS):
+    if not upload_folder or not os.path.isdir(upload_folder):
+        return {'items': 0, 'reclaimed_bytes': 0}
+    referenced = referenced_uploads(conn)
+    cutoff = time.time() - grace
+    removed = 0
+    reclaimed = 0
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name in referenced:
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.error(f"Could not remove upload {entry.path}: {str(e)}")
+                continue
+            removed += 1
+            reclaimed += stat.st_size
+            if removed % batch_size == 0:
+                time.sleep(pause)
+    return {'items': removed, 'reclaimed_bytes': reclaimed}
+
+
+# Orphans are swept before uploads are collected and before vacuuming, so the
+# pages and files they free are reclaimed in the same run.
+JOBS = {
+    'sweep_orphans': sweep_orphans,
+    'gc_uploads': gc_uploads,
+    'incremental_vacuum': incremental_vacuum,
+    'optimize': optimize_db,
+    'checkpoint_wal': checkpoint_wal,
+}
+
+
+def run_maintenance(db_path=DATABASE, upload_folder=UPLOAD_FOLDER, jobs=None):
+    report = {}
+    conn = connect(db_path)
+    try:
+        for name in jobs or JOBS:
+            job = JOBS[name]
+            started = time.perf_counter()
+            try:
+                result = job(conn, upload_folder=upload_folder)
+            except sqlite3.Error as e:
+                conn.rollback()
+                logger.error(f"Maintenance job {name} failed: {str(e)}")
+                result = {'items': 0, 'reclaimed_bytes': 0, 'error': str(e)}
+            result['seconds'] = round(time.perf_counter() - started, 3)
+            report[name] = result
+            logger.info(
+                f"Maintenance job {name}: {result['seconds']}s, "
+                f"{result['items']} items, {result['reclaimed_bytes']} bytes reclaimed"
+            )
+    finally:
+        conn.close()
+    return report
+
+
+class MaintenanceScheduler:
+    def __init__(self, interval, db_path=DATABASE, upload_folder=UPLOAD_FOLDER, jobs=None):
+        self.interval = interval
+        self.db_path = db_path
+        self.upload_folder = upload_folder
+        self.jobs = jobs
+        self.last_report = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def run_once(self):
+        # Never let two runs overlap if one is slow and the timer fires again.
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self.last_report = run_maintenance(self.db_path, self.upload_folder, self.jobs)
+            return self.last_report
+        finally:
+            self._lock.release()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Maintenance run failed: {str(e)}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='crave-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def start_scheduler(app):
+    interval = app.config.get('MAINTENANCE_INTERVAL', 0)
+    if not interval:
+        return None
+    scheduler = app.extensions.get('maintenance')
+    if scheduler is None:
+        scheduler = MaintenanceScheduler(
+            interval,
+            db_path=app.config.get('DATABASE', DATABASE),
+            upload_folder=app.config['UPLOAD_FOLDER'],
+        )
+        app.extensions['maintenance'] = scheduler
+    scheduler.start()
+    return scheduler
+
+
+def main(argv=None):
+    # Same defaults as the running app, so the CLI targets the same files.
+    from app import default_config
+    config = default_config()
+    parser = argparse.ArgumentParser(description='Run Crave database and upload maintenance.')
+    parser.add_argument('--db', default=config['DATABASE'], help='path to the SQLite database')
+    parser.add_argument('--uploads', default=config['UPLOAD_FOLDER'], help='path to the uploads folder')
+    parser.add_argument('--job', action='append', choices=list(JOBS), dest='jobs',
+                        help='run only this job (repeatable, default: all)')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='convert an existing database to auto_vacuum=INCREMENTAL '
+                             '(one-off full VACUUM, blocks writers while it runs)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.enable_incremental_vacuum:
+        started = time.perf_counter()
+        if enable_incremental_vacuum(args.db):
+            print(f"Converted {args.db} to incremental auto_vacuum in {time.perf_counter() - started:.3f}s")
+        else:
+            print(f"{args.db} already uses incremental auto_vacuum")
+        return 0
+    report = run_maintenance(args.db, args.uploads, args.jobs)
+    total = 0
+    for name, result in report.items():
+        total += result['reclaimed_bytes']
+        status = f" ERROR: {result['error']}" if 'error' in result else ''
+        print(f"{name:<20} {result['seconds']:>8.3f}s {result['items']:>8} items "
+              f"{result['reclaimed_bytes']:>12} bytes{status}")
+    print(f"{'total':<20} {sum(r['seconds'] for r in report.values()):>8.3f}s "
+          f"{'':>14} {total:>12} bytes")
+    return 1 if any('error' in r for r in report.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
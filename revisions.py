@@ -0,0 +1,100 @@
+import json
+import zlib
+from difflib import SequenceMatcher
+
+# Fields of a recipe that are versioned. The image filename is kept in its
+# own column on recipe_revisions so upload GC can see it without decoding.
+FIELDS = ('title', 'ingredients', 'instructions', 'category', 'tags')
+
+# Every SNAPSHOT_EVERY-th revision is stored in full, so rebuilding any
+# revision applies at most SNAPSHOT_EVERY - 1 deltas.
+SNAPSHOT_EVERY = 10
+
+SNAPSHOT = 'snapshot'
+DELTA = 'delta'
+
+
+def recipe_document(row):
+    return {field: row[field] or '' for field in FIELDS}
+
+
+def _pack(obj):
+    return zlib.compress(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+def _diff_text(old, new):
+    # Line-level ops against the old text: [start, end] copies old lines,
+    # a string inserts new text.
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return ops
+
+
+def _patch_text(old, ops):
+    old_lines = old.splitlines(keepends=True)
+    return ''.join(
+        ''.join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in ops
+    )
+
+
+def encode_snapshot(document):
+    return _pack(document)
+
+
+def encode_delta(old, new):
+    # Unchanged fields are left out entirely.
+    return _pack({
+        field: _diff_text(old[field], new[field])
+        for field in FIELDS if old[field] != new[field]
+    })
+
+
+def diff_fields(old, new, old_image=None, new_image=None):
+    changed = [field for field in FIELDS if old[field] != new[field]]
+    if old_image != new_image:
+        changed.append('image')
+    return changed
+
+
+def encode_changed(fields):
+    return ','.join(fields)
+
+
+def changed_fields(row):
+    # Revisions record what changed in their own column, whatever their kind.
+    # Rows written before that column existed only have it for deltas.
+    if row['changed'] is not None:
+        return row['changed'].split(',') if row['changed'] else []
+    if row['kind'] == SNAPSHOT:
+        return []
+    return list(_unpack(row['data']))
+
+
+def is_snapshot_revision(revision):
+    return revision == 1 or (revision - 1) % SNAPSHOT_EVERY == 0
+
+
+def rebuild(rows):
+    # rows: the nearest snapshot followed by every later delta, in order.
+    document = None
+    for row in rows:
+        if row['kind'] == SNAPSHOT:
+            document = _unpack(row['data'])
+        else:
+            delta = _unpack(row['data'])
+            document = {
+                field: _patch_text(document[field], delta[field]) if field in delta else document[field]
+                for field in FIELDS
+            }
+    return document
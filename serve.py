@@ -0,0 +1,115 @@
+import os
+import sys
+import logging
+import argparse
+
+import uvicorn
+from a2wsgi import WSGIMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Idle connections are held by uvicorn's event loop, but every request being
+# handled occupies one of these threads, async views included (they run their
+# own loop on it). Per-worker request concurrency is bounded by this pool.
+WSGI_THREADS = int(os.environ.get('WSGI_THREADS', 32))
+
+
+class CraveASGI:
+    def __init__(self, threads=WSGI_THREADS):
+        from app import create_app
+        # Schedulers run once in the supervisor (see start_schedulers).
+        app = create_app({'MAINTENANCE_INTERVAL': 0, 'BACKUP_INTERVAL': 0})
+        self.app = app
+        self.wsgi = WSGIMiddleware(app, workers=threads)
+
+    async def lifespan(self, receive, send):
+        import database
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Let queries that are already running finish before exiting.
+                database.shutdown_executor(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+
+def create_asgi_app():
+    return CraveASGI()
+
+
+def default_workers():
+    # SQLite serialises writers, so extra processes past the core count only
+    # add lock contention.
+    return os.cpu_count() or 1
+
+
+def start_schedulers():
+    # Maintenance and backups run once in the supervisor rather than in every
+    # worker. Paths come from the same config create_app uses, so both sides
+    # see one DB.
+    from app import default_config
+    from maintenance import MaintenanceScheduler
+    from backup import BackupScheduler
+    config = default_config()
+    schedulers = []
+    if config['MAINTENANCE_INTERVAL']:
+        schedulers.append(MaintenanceScheduler(
+            config['MAINTENANCE_INTERVAL'],
+            db_path=config['DATABASE'],
+            upload_folder=config['UPLOAD_FOLDER'],
+        ))
+    if config['BACKUP_INTERVAL']:
+        schedulers.append(BackupScheduler(
+            config['BACKUP_INTERVAL'],
+            db_path=config['DATABASE'],
+            upload_folder=config['UPLOAD_FOLDER'],
+            backup_folder=config['BACKUP_FOLDER'],
+        ))
+    for scheduler in schedulers:
+        scheduler.start()
+    return schedulers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Crave in production.')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', default_workers())))
+    parser.add_argument('--backlog', type=int, default=4096, help='pending connection queue size')
+    parser.add_argument('--limit-concurrency', type=int, default=None,
+                        help='max open connections per worker before returning 503')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='seconds to wait for in-flight requests on shutdown')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    schedulers = start_schedulers()
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+    try:
+        uvicorn.run(
+            'serve:create_asgi_app',
+            factory=True,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            backlog=args.backlog,
+            limit_concurrency=args.limit_concurrency,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            lifespan='on',
+        )
+    finally:
+        for scheduler in schedulers:
+            scheduler.stop(timeout=args.graceful_timeout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
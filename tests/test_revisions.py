@@ -0,0 +1,51 @@
+import random
+import unittest
+
+import revisions
+
+
+def random_text(rng):
+    lines = ['1 cup flour', '2 eggs', 'pinch of salt', 'mix well', 'bake 20 min', '']
+    return '\n'.join(rng.choice(lines) for _ in range(rng.randint(0, 6)))
+
+
+def random_document(rng):
+    return {field: random_text(rng) for field in revisions.FIELDS}
+
+
+def edit(rng, document):
+    edited = dict(document)
+    for field in rng.sample(revisions.FIELDS, rng.randint(1, len(revisions.FIELDS))):
+        lines = edited[field].splitlines(keepends=True)
+        if lines and rng.random() < 0.5:
+            del lines[rng.randrange(len(lines))]
+        lines.insert(rng.randint(0, len(lines)), random_text(rng) + '\n')
+        edited[field] = ''.join(lines)
+    return edited
+
+
+class RevisionRoundTripTest(unittest.TestCase):
+    def test_rebuild_matches_every_revision(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            documents = [random_document(rng)]
+            rows = [{'kind': revisions.SNAPSHOT, 'data': revisions.encode_snapshot(documents[0])}]
+            for revision in range(2, 2 * revisions.SNAPSHOT_EVERY + 3):
+                documents.append(edit(rng, documents[-1]))
+                if revisions.is_snapshot_revision(revision):
+                    data = revisions.encode_snapshot(documents[-1])
+                    rows.append({'kind': revisions.SNAPSHOT, 'data': data})
+                else:
+                    data = revisions.encode_delta(documents[-2], documents[-1])
+                    rows.append({'kind': revisions.DELTA, 'data': data})
+            for index, document in enumerate(documents):
+                self.assertEqual(revisions.rebuild(rows[:index + 1]), document)
+
+    def test_diff_fields_includes_image(self):
+        document = random_document(random.Random(1))
+        self.assertEqual(revisions.diff_fields(document, document, 'a.jpg', 'b.jpg'), ['image'])
+        self.assertEqual(revisions.diff_fields(document, document, 'a.jpg', 'a.jpg'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
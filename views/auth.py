@@ -0,0 +1,104 @@
+import os
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, flash
+from werkzeug.security import check_password_hash
+from database import add_user, get_user_by_username, get_user_favorites, get_user_recipes
+
+bp = Blueprint('auth', __name__)
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    current_app.logger.info(f"Login attempt, method: {request.method}, form: {request.form}")
+    
+    if request.method == 'POST':
+        try:
+            username = request.form.get('username', '').strip()
+            password = request.form.get('password', '')
+            current_app.logger.info(f"Attempting login for username: {username}")
+
+            if not username or not password:
+                flash("Username and password are required", "error")
+                return redirect(url_for('auth.login'))
+
+            user = get_user_by_username(username)
+            current_app.logger.info(f"User query result: {user}")
+
+            if user is None:
+                flash("Invalid username or password", "error")
+                return redirect(url_for('auth.login'))
+
+            if check_password_hash(user['password'], password):
+                session['username'] = username
+                session['user_id'] = user['id']
+                current_app.logger.info(f"Login successful for {username}")
+                flash("Login successful!", "success")
+                return redirect(url_for('recipes.view_recipes'))
+
+            flash("Invalid username or password", "error")
+            return redirect(url_for('auth.login'))
+
+        except Exception as e:
+            current_app.logger.error(f"Login error: {str(e)}")
+            flash("Server error. Please try again.", "error")
+            return redirect(url_for('auth.login'))
+
+    return render_template('login.html')
+
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    current_app.logger.info(f"Register attempt, method: {request.method}, form: {request.form}")
+    if request.method == 'POST':
+        try:
+            username = request.form.get('username', '').strip()
+            password = request.form.get('password', '')
+            current_app.logger.info(f"Attempting to register username: {username}")
+            if not username or not password:
+                current_app.logger.error("Missing username or password")
+                return "Username and password are required", 400
+            if get_user_by_username(username):
+                current_app.logger.error(f"Username already exists: {username}")
+                return "Username already exists", 400
+            add_user(username, password)
+            current_app.logger.info(f"User registered successfully: {username}")
+            return redirect(url_for('auth.login'))
+        except ValueError as e:
+            current_app.logger.error(f"Registration error: {str(e)}")
+            return str(e), 400
+        except Exception as e:
+            current_app.logger.error(f"Server error during registration: {str(e)}")
+            return f"Server error: {str(e)}", 500
+    return render_template('register.html')
+
+
+@bp.route('/logout')
+def logout():
+    session.pop('username', None)
+    session.pop('user_id', None)
+    return redirect(url_for('recipes.home'))
+
+
+@bp.route('/profile')
+def profile():
+    if 'user_id' not in session:
+        current_app.logger.info("No user_id in session, redirecting to login")
+        return redirect(url_for('auth.login'))
+    try:
+        user_id = session['user_id']
+        username = session['username']
+        favorites = get_user_favorites(user_id)
+        user_recipes = get_user_recipes(user_id)
+        current_app.logger.info(f"Profile loaded for user_id: {user_id}, username: {username}, recipes: {len(user_recipes)}, favorites: {len(favorites)}")
+        for recipe in user_recipes + favorites:
+            if recipe['image']:
+                image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], recipe['image'])
+                current_app.logger.info(f"Checking image for recipe {recipe['id']}: {image_path}, exists: {os.path.exists(image_path)}")
+        return render_template(
+            'profile.html',
+            username=username,
+            user_recipes=user_recipes,
+            favorites=favorites,
+            user_favorites_ids=[fav['id'] for fav in favorites]
+        )
+    except Exception as e:
+        current_app.logger.error(f"Profile error: {str(e)}")
+        return f"Server error: {str(e)}", 500
@@ -0,0 +1,46 @@
+from flask import Blueprint, render_template, request, session, jsonify
+from database import (
+    add_comment_async,
+    get_comment_by_id_async,
+    delete_comment_from_db_async,
+    get_comments_for_recipe_async,
+)
+
+bp = Blueprint('comments', __name__)
+
+@bp.route("/add_comment/<int:recipe_id>", methods=["POST"])
+async def add_comment_route(recipe_id):
+    if "user_id" not in session:
+        return jsonify({"success": False, "error": "Login required"}), 401
+
+    comment_text = request.form.get("comment_text")
+    if not comment_text:
+        return jsonify({"success": False, "error": "Comment cannot be empty"}), 400
+
+    await add_comment_async(session["user_id"], recipe_id, comment_text)
+
+    comments = await get_comments_for_recipe_async(recipe_id)
+    return jsonify({
+        "success": True,
+        "html": render_template("partials/_comments.html", comments=comments, user_id=session.get("user_id")),
+        "message": "Comment added successfully!"
+    })
+
+
+@bp.route("/delete_comment/<int:comment_id>", methods=["POST"])
+async def delete_comment(comment_id):
+    if "user_id" not in session:
+        return jsonify({"success": False, "error": "Login required"}), 401
+
+    comment = await get_comment_by_id_async(comment_id)
+    if not comment or comment["user_id"] != session["user_id"]:
+        return jsonify({"success": False, "error": "Comment deleted"}), 403
+
+    await delete_comment_from_db_async(comment_id)
+
+    comments = await get_comments_for_recipe_async(comment["recipe_id"])
+    return jsonify({
+        "success": True,
+        "html": render_template("partials/_comments.html", comments=comments, user_id=session.get("user_id")),
+        "message": "Comment deleted"
+    })
@@ -0,0 +1,69 @@
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, jsonify
+from database import get_db, get_user_favorites
+
+bp = Blueprint('favorites', __name__)
+
+@bp.route('/favorites')
+def view_favorites():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = 8
+        offset = (page - 1) * per_page
+        all_favorites = get_user_favorites(session['user_id'])
+        paginated_favorites = all_favorites[offset:offset + per_page]
+        has_next = len(all_favorites) > offset + per_page
+        return render_template(
+            'favorites.html',
+            favorites=paginated_favorites,
+            page=page,
+            has_next=has_next
+        )
+    except Exception as e:
+        current_app.logger.error(f"View favorites error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/favorite/<int:recipe_id>', methods=['POST'])
+def add_favorite(recipe_id):
+    if 'user_id' not in session:
+        # Return error if the user is not logged in
+        return jsonify({'success': False, 'error': 'You need to log in to perform this action.'}), 401
+
+    try:
+        db = get_db()
+        cursor = db.cursor()
+
+        # Check if the recipe is already in the user's favorites
+        cursor.execute(
+            "SELECT 1 FROM favorites WHERE user_id = ? AND recipe_id = ?",
+            (session['user_id'], recipe_id)
+        )
+        is_favorited = bool(cursor.fetchone())
+
+        if is_favorited:
+            # Remove from favorites if already favorited
+            cursor.execute(
+                "DELETE FROM favorites WHERE user_id = ? AND recipe_id = ?",
+                (session['user_id'], recipe_id)
+            )
+            db.commit()
+            action = 'removed'
+            message = 'Recipe removed from favorites.'
+        else:
+            # Add to favorites if not already favorited
+            cursor.execute(
+                "INSERT INTO favorites (user_id, recipe_id) VALUES (?, ?)",
+                (session['user_id'], recipe_id)
+            )
+            db.commit()
+            action = 'added'
+            message = 'Recipe added to favorites.'
+
+        # Return success response
+        return jsonify({'success': True, 'action': action, 'message': message})
+
+    except Exception as e:
+        current_app.logger.error(f"Error in add_favorite: {str(e)}")
+        return jsonify({'success': False, 'error': 'An error occurred while updating favorites.'}), 500
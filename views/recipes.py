@@ -0,0 +1,387 @@
+import os
+import asyncio
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, jsonify, flash, get_flashed_messages
+from werkzeug.utils import secure_filename
+import revisions
+from database import (
+    get_db,
+    get_recipe_by_id,
+    get_recipes_by_tag,
+    add_recipe_to_db,
+    update_recipe,
+    delete_recipe_from_db,
+    get_recipe_revisions,
+    get_recipe_revision,
+    get_recipe_by_id_async,
+    get_all_recipes_with_users_async,
+    get_user_favorites_async,
+    get_comments_for_recipe_async,
+    search_recipe_titles_async,
+)
+
+bp = Blueprint('recipes', __name__)
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+def allowed_file(filename):
+    if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in ALLOWED_EXTENSIONS:
+        return False
+    return True
+
+@bp.route('/')
+def home():
+    return render_template('index.html')
+
+
+@bp.route('/add_recipe', methods=['GET', 'POST'])
+def add_recipe():
+    if 'user_id' not in session:
+        current_app.logger.info("No user_id in session, redirecting to login")
+        return redirect(url_for('auth.login'))
+    if request.method == 'POST':
+        try:
+            title = request.form.get('title', '').strip()
+            ingredients = request.form.get('ingredients', '').strip()
+            instructions = request.form.get('instructions', '').strip()
+            category = request.form.get('category', '').strip()
+            tags = request.form.get('tags', '').strip()
+            current_app.logger.info(f"Adding recipe: {title}")
+            if not all([title, ingredients, instructions, category]):
+                current_app.logger.error("Missing required fields")
+                return "All fields except tags and image are required", 400
+            image = request.files.get('image')
+            filename = None
+            if image and allowed_file(image.filename):
+                try:
+                    filename = secure_filename(image.filename)
+                    image.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+                    current_app.logger.info(f"Image saved: {filename}")
+                except Exception as e:
+                    current_app.logger.error(f"Invalid image file: {str(e)}")
+                    return f"Invalid image file: {str(e)}", 400
+            add_recipe_to_db(
+                session['user_id'], title, ingredients, instructions, category, tags, filename
+            )
+            flash('Recipe added!')
+            return redirect(url_for('recipes.view_recipes'))
+            current_app.logger.info(f"Recipe added successfully: {title}")
+            return redirect(url_for('recipes.view_recipes'))
+        except Exception as e:
+            current_app.logger.error(f"Add recipe error: {str(e)}")
+            return f"Server error: {str(e)}", 500
+    return render_template('add_recipe.html')
+
+
+@bp.route('/recipes')
+async def view_recipes():
+    if 'user_id' not in session:
+        current_app.logger.info("No user_id in session, redirecting to login")
+        return redirect(url_for('auth.login'))
+    try:
+        current_app.logger.info(f"Fetching recipes for user_id: {session['user_id']}")
+
+        # Pagination
+        page = request.args.get('page', 1, type=int)
+        per_page = 8
+        offset = (page - 1) * per_page
+
+        # Filters
+        selected_category = request.args.get('category')
+        query = request.args.get('query', '').strip()
+
+        # All recipes and the user's favorites, fetched concurrently
+        all_recipes, favorites = await asyncio.gather(
+            get_all_recipes_with_users_async(),
+            get_user_favorites_async(session['user_id']),
+        )
+        current_app.logger.info(f"Retrieved {len(all_recipes)} recipes")
+
+        # Categories for chips
+        categories = list({r['category'] for r in all_recipes if r['category']})
+
+        # Category filter
+        if selected_category:
+            all_recipes = [r for r in all_recipes if r['category'] == selected_category]
+            current_app.logger.info(f"Filtered by category: {selected_category} → {len(all_recipes)} recipes")
+
+        # Search filter
+        if query:
+            all_recipes = [r for r in all_recipes if query.lower() in r['title'].lower()]
+            current_app.logger.info(f"Filtered by search query '{query}' → {len(all_recipes)} recipes")
+
+        # Pagination
+        paginated_recipes = all_recipes[offset:offset + per_page]
+        has_next = len(all_recipes) > offset + per_page
+
+        # Favorites
+        user_favorites_ids = [fav['id'] for fav in favorites]
+        current_app.logger.info(f"User favorites: {user_favorites_ids}")
+
+        return render_template(
+            'recipes.html',
+            recipes=paginated_recipes,
+            user_favorites_ids=user_favorites_ids,
+            page=page,
+            has_next=has_next,
+            categories=categories,
+            selected_category=selected_category,
+            query=query  # so the input keeps its value
+        )
+    except Exception as e:
+        current_app.logger.error(f"View recipes error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/recipe/<int:recipe_id>')
+async def recipe_detail(recipe_id):
+    if 'user_id' not in session:
+        current_app.logger.info("No user_id in session, redirecting to login")
+        return redirect(url_for('auth.login'))
+    try:
+        recipe, favorites, comments = await asyncio.gather(
+            get_recipe_by_id_async(recipe_id),
+            get_user_favorites_async(session['user_id']),
+            get_comments_for_recipe_async(recipe_id),
+        )
+        if not recipe:
+            current_app.logger.error(f"Recipe not found: {recipe_id}")
+            return "Recipe not found", 404
+        
+        user_favorites_ids = [fav['id'] for fav in favorites]
+        
+        current_app.logger.info(f"Recipe detail loaded: {recipe['title']}, favorites: {user_favorites_ids}")
+        if recipe['image']:
+            image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], recipe['image'])
+            current_app.logger.info(f"Checking image for recipe {recipe_id}: {image_path}, exists: {os.path.exists(image_path)}")
+        
+        return render_template(
+            'recipe_detail.html',
+            recipe=recipe,
+            comments=comments  ,
+            user_id=session.get("user_id"),
+            user_favorites_ids=user_favorites_ids,
+        )
+    except Exception as e:
+        current_app.logger.error(f"Recipe detail error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/search_suggestions')
+async def search_suggestions():
+    query = request.args.get('q', '').lower()
+    results = []
+
+    if query:
+        rows = await search_recipe_titles_async(query)
+
+        results = [{"id": row["id"], "title": row["title"]} for row in rows]
+
+    return jsonify(results)
+
+
+@bp.route('/search')
+def search():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        query = request.args.get('query', '').strip()
+        if not query:
+            return redirect(url_for('recipes.view_recipes'))
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute('''
+            SELECT * FROM recipes
+            WHERE LOWER(title) LIKE ? OR LOWER(tags) LIKE ? OR LOWER(category) LIKE ?
+        ''', (f'%{query.lower()}%', f'%{query.lower()}%', f'%{query.lower()}%'))
+        results = cursor.fetchall()
+        return render_template('recipes.html', recipes=results)
+    except Exception as e:
+        current_app.logger.error(f"Search error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/edit_recipe/<int:recipe_id>', methods=['GET', 'POST'])
+def edit_recipe(recipe_id):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        recipe = get_recipe_by_id(recipe_id)
+        if not recipe or recipe['user_id'] != session['user_id']:
+            current_app.logger.error(f"Not authorized to edit recipe_id: {recipe_id}")
+            return "Not authorized", 403
+        if request.method == 'POST':
+            title = request.form.get('title', '').strip()
+            ingredients = request.form.get('ingredients', '').strip()
+            instructions = request.form.get('instructions', '').strip()
+            category = request.form.get('category', '').strip()
+            tags = request.form.get('tags', '').strip()
+            if not all([title, ingredients, instructions, category]):
+                current_app.logger.error("Missing required fields for edit recipe")
+                return "All fields except tags and image are required", 400
+            new_image = request.files.get('new_image')
+            filename = recipe['image']
+            if new_image and allowed_file(new_image.filename):
+                try:
+                    filename = secure_filename(new_image.filename)
+                    image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+                    new_image.save(image_path)
+                    current_app.logger.info(f"Image saved for edit: {image_path}")
+                except Exception as e:
+                    current_app.logger.error(f"Invalid image file: {str(e)}")
+                    return f"Invalid image file: {str(e)}", 400
+            update_recipe(
+                recipe_id, title, ingredients, instructions, category, tags, filename,
+                user_id=session['user_id']
+            )
+            flash('Recipe updated!')
+            current_app.logger.info(f"Recipe updated successfully: {recipe_id}")
+            return redirect(url_for('recipes.view_recipes'))
+        return render_template('edit_recipe.html', recipe=recipe)
+    except Exception as e:
+        current_app.logger.error(f"Edit recipe error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/delete_recipe/<int:recipe_id>', methods=['POST'])
+def delete_recipe(recipe_id):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        recipe = get_recipe_by_id(recipe_id)
+        if recipe and recipe['user_id'] == session['user_id']:
+            # Delete image file if it exists
+            if recipe['image']:
+                image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], recipe['image'])
+                if os.path.exists(image_path):
+                    os.remove(image_path)
+            delete_recipe_from_db(recipe_id)
+            flash('Recipe deleted!')
+            current_app.logger.info(f"Recipe deleted: {recipe_id}")
+        return redirect(url_for('recipes.view_recipes'))
+    except Exception as e:
+        current_app.logger.error(f"Delete recipe error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/recipe/<int:recipe_id>/history')
+def recipe_history(recipe_id):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        recipe = get_recipe_by_id(recipe_id)
+        if not recipe or recipe['user_id'] != session['user_id']:
+            current_app.logger.error(f"Not authorized to view history of recipe_id: {recipe_id}")
+            return "Not authorized", 403
+        history = [
+            {
+                'revision': row['revision'],
+                'created_at': row['created_at'],
+                'username': row['username'],
+                'kind': row['kind'],
+                'size': row['size'],
+                'changed': revisions.changed_fields(row),
+            }
+            for row in get_recipe_revisions(recipe_id)
+        ]
+        return render_template('recipe_history.html', recipe=recipe, history=history)
+    except Exception as e:
+        current_app.logger.error(f"Recipe history error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/recipe/<int:recipe_id>/history/<int:revision>')
+def recipe_revision(recipe_id, revision):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        recipe = get_recipe_by_id(recipe_id)
+        if not recipe or recipe['user_id'] != session['user_id']:
+            current_app.logger.error(f"Not authorized to view history of recipe_id: {recipe_id}")
+            return "Not authorized", 403
+        version = get_recipe_revision(recipe_id, revision)
+        if not version:
+            return "Revision not found", 404
+        return render_template('recipe_revision.html', recipe=recipe, version=version)
+    except Exception as e:
+        current_app.logger.error(f"Recipe revision error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/recipe/<int:recipe_id>/history/<int:revision>/restore', methods=['POST'])
+def restore_revision(recipe_id, revision):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        recipe = get_recipe_by_id(recipe_id)
+        if not recipe or recipe['user_id'] != session['user_id']:
+            current_app.logger.error(f"Not authorized to restore recipe_id: {recipe_id}")
+            return "Not authorized", 403
+        version = get_recipe_revision(recipe_id, revision)
+        if not version:
+            return "Revision not found", 404
+        # Keep the current image if the revision's file is no longer on disk.
+        image = version['image']
+        if image and not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], image)):
+            image = None
+        # Restoring is recorded as a new revision, so it can be undone too.
+        update_recipe(
+            recipe_id, version['title'], version['ingredients'], version['instructions'],
+            version['category'], version['tags'], image, user_id=session['user_id']
+        )
+        flash(f'Recipe restored to revision {revision}!')
+        current_app.logger.info(f"Recipe {recipe_id} restored to revision {revision}")
+        return redirect(url_for('recipes.recipe_history', recipe_id=recipe_id))
+    except Exception as e:
+        current_app.logger.error(f"Restore revision error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/tags/<tag>')
+def recipes_by_tag(tag):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    try:
+        recipes = get_recipes_by_tag(f'%{tag}%')
+        return render_template('recipes.html', recipes=recipes)
+    except Exception as e:
+        current_app.logger.error(f"Recipes by tag error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/recipe/<int:recipe_id>/share')
+def share_recipe(recipe_id):
+    try:
+        recipe = get_recipe_by_id(recipe_id)
+        if not recipe:
+            current_app.logger.error(f"Recipe not found: {recipe_id}")
+            return "Recipe not found", 404
+        current_app.logger.info(f"Share recipe loaded: {recipe['title']}")
+        if recipe['image']:
+            image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], recipe['image'])
+            current_app.logger.info(f"Checking image for recipe {recipe_id}: {image_path}, exists: {os.path.exists(image_path)}")
+        return render_template('recipe_detail.html', recipe=recipe, user_favorites_ids=[])
+    except Exception as e:
+        current_app.logger.error(f"Share recipe error: {str(e)}")
+        return f"Server error: {str(e)}", 500
+
+
+@bp.route('/copy_share_link/<int:recipe_id>', methods=['POST'])
+def copy_share_link(recipe_id):
+    try:
+        recipe = get_recipe_by_id(recipe_id)
+        if not recipe:
+            current_app.logger.error(f"Recipe not found: {recipe_id}")
+            return jsonify({'error': 'Recipe not found'}), 404
+        share_url = url_for('recipes.share_recipe', recipe_id=recipe_id, _external=True)
+        flash('Share link copied!', 'success')
+        # Get flashed messages to clear them
+        flashed_messages = get_flashed_messages(with_categories=True)
+        current_app.logger.info(f"Share link copied for recipe_id: {recipe_id}")
+        return jsonify({
+            'success': True,
+            'message': flashed_messages[0][1] if flashed_messages else 'Share link copied!',
+            'url': share_url
+        })
+    except Exception as e:
+        current_app.logger.error(f"Copy share link error: {str(e)}")
+        return jsonify({'error': str(e)}), 500